@@ -1,15 +1,41 @@
+import csv
 import json
 import os
+import tempfile
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import re
 import argparse
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+# Matches iteration-suffixed Gemini output files, e.g. step_2_gemini_1.json
+GEMINI_STEP_FILE_PATTERN = re.compile(r"step_(.+?)_gemini_(\d+)\.json")
+
+# Column order of the comparison rows built by compare_files
+COMPARISON_COLUMNS = [
+    'File',
+    'Iteration',
+    'Claude Function',
+    'Claude Parameters',
+    'Gemini Function',
+    'Gemini Parameters',
+    'Match',
+    'Candidates Token Count'
+]
 
 def load_json_file(filepath: str) -> Optional[Dict[str, Any]]:
     """Load a JSON file and return its contents."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        data = Path(filepath).read_bytes()
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
     except Exception as e:
         print(f"Error loading {filepath}: {e}")
         return None
@@ -55,42 +81,39 @@ def extract_gemini_token_count(data: Dict[str, Any]) -> Optional[int]:
         return data['usage']['candidatesTokenCount']
     return None
 
+def _format_value(value: Any) -> Any:
+    """Shorten a parameter value for display."""
+    if isinstance(value, str):
+        # Only truncate the VALUE if it's very long, not the parameter name
+        if len(value) > 100:
+            return value[:97] + "..."
+    elif isinstance(value, list):
+        # Show list details
+        return f"[{len(value)} items]"
+    elif isinstance(value, dict):
+        # Show dict details
+        return f"{{dict with {len(value)} keys}}"
+    elif value is None:
+        return "None"
+    return value
+
 def format_arguments(args: Dict[str, Any]) -> str:
     """Format arguments as a readable string - show all parameters sorted by name."""
     if not args:
         return "{}"
     
-    formatted_parts = []
-    # Sort parameters by key name
-    for key in sorted(args.keys()):
-        value = args[key]
-        if isinstance(value, str):
-            # Only truncate the VALUE if it's very long, not the parameter name
-            if len(value) > 100:
-                value = value[:97] + "..."
-        elif isinstance(value, list):
-            # Show list details
-            value = f"[{len(value)} items]"
-        elif isinstance(value, dict):
-            # Show dict details
-            value = f"{{dict with {len(value)} keys}}"
-        elif value is None:
-            value = "None"
-        
-        # Always show the full parameter name
-        formatted_parts.append(f"{key}: {value}")
-    
-    # Join all parameters with newlines for CSV
-    return "\n".join(formatted_parts)
+    # Always show the full parameter name, sorted by key name, joined with newlines for CSV
+    return "\n".join(f"{key}: {_format_value(value)}" for key, value in sorted(args.items()))
 
-def compare_files(output_dir: str, output_gemini_dir: str) -> pd.DataFrame:
-    """Compare function calls between Claude and Gemini outputs."""
-    results = []
+def iter_comparison_rows(output_dir: str, output_gemini_dir: str) -> Iterator[Tuple[Any, ...]]:
+    """Yield one comparison row per function call pair, in COMPARISON_COLUMNS order."""
+    match_gemini_file = GEMINI_STEP_FILE_PATTERN.match
     
     # Get all subdirectories in output
-    subdirs = [d for d in os.listdir(output_dir) if os.path.isdir(os.path.join(output_dir, d))]
+    with os.scandir(output_dir) as entries:
+        subdirs = sorted(entry.name for entry in entries if entry.is_dir())
     
-    for subdir in sorted(subdirs):
+    for subdir in subdirs:
         claude_dir = os.path.join(output_dir, subdir)
         gemini_dir = os.path.join(output_gemini_dir, subdir)
         
@@ -98,26 +121,32 @@ def compare_files(output_dir: str, output_gemini_dir: str) -> pd.DataFrame:
             print(f"Warning: Gemini directory not found for {subdir}")
             continue
         
+        # Index the Gemini files by step number with a single directory scan
+        gemini_names = set(os.listdir(gemini_dir))
+        gemini_files_by_step = defaultdict(list)
+        for f in gemini_names:
+            # Match files like step_2_gemini_1.json
+            match = match_gemini_file(f)
+            if match:
+                gemini_files_by_step[match.group(1)].append((f, int(match.group(2))))
+        
         # Get all step files in the directory
-        step_files = [f for f in os.listdir(claude_dir) if f.startswith('step_') and f.endswith('.json')]
+        with os.scandir(claude_dir) as entries:
+            step_files = sorted(
+                entry.name for entry in entries
+                if entry.name.startswith('step_') and entry.name.endswith('.json') and entry.is_file()
+            )
         
-        for step_file in sorted(step_files):
+        for step_file in step_files:
             step_num = step_file.replace('step_', '').replace('.json', '')
             
             # Find all matching gemini files with iteration pattern
-            gemini_files = []
-            
-            for f in os.listdir(gemini_dir):
-                # Match files like step_2_gemini_1.json
-                match = re.match(rf"step_{step_num}_gemini_(\d+)\.json", f)
-                if match:
-                    iteration = int(match.group(1))
-                    gemini_files.append((f, iteration))
+            gemini_files = list(gemini_files_by_step.get(step_num, []))
             
             # If no files with iteration pattern, try old format
             if not gemini_files:
                 old_gemini_file = f"step_{step_num}_gemini.json"
-                if os.path.exists(os.path.join(gemini_dir, old_gemini_file)):
+                if old_gemini_file in gemini_names:
                     gemini_files.append((old_gemini_file, 0))
             
             # Sort by iteration number
@@ -130,8 +159,11 @@ def compare_files(output_dir: str, output_gemini_dir: str) -> pd.DataFrame:
             if not claude_data:
                 continue
             
-            # Extract Claude function calls once
-            claude_calls = extract_claude_function_calls(claude_data)
+            # Extract and format Claude function calls once for all Gemini iterations
+            claude_calls = [
+                (call['name'], format_arguments(call['arguments']))
+                for call in extract_claude_function_calls(claude_data)
+            ]
             
             # Process each gemini file
             for gemini_file, iteration in gemini_files:
@@ -152,37 +184,85 @@ def compare_files(output_dir: str, output_gemini_dir: str) -> pd.DataFrame:
                 max_calls = max(len(claude_calls), len(gemini_calls))
                 
                 for i in range(max_calls):
-                    row = {
-                        'File': f"output/{subdir}/step_{step_num}",
-                        'Iteration': iteration if iteration > 0 else '',
-                        'Claude Function': '',
-                        'Claude Parameters': '',
-                        'Gemini Function': '',
-                        'Gemini Parameters': '',
-                        'Match': '',
-                        'Candidates Token Count': token_count if token_count is not None else ''
-                    }
+                    claude_function = claude_parameters = ''
+                    gemini_function = gemini_parameters = ''
                     
                     if i < len(claude_calls):
-                        row['Claude Function'] = claude_calls[i]['name']
-                        row['Claude Parameters'] = format_arguments(claude_calls[i]['arguments'])
+                        claude_function, claude_parameters = claude_calls[i]
                     
                     if i < len(gemini_calls):
-                        row['Gemini Function'] = gemini_calls[i]['name']
-                        row['Gemini Parameters'] = format_arguments(gemini_calls[i]['arguments'])
+                        gemini_function = gemini_calls[i]['name']
+                        gemini_parameters = format_arguments(gemini_calls[i]['arguments'])
                     
                     # Check if functions match
-                    if row['Claude Function'] and row['Gemini Function']:
-                        if row['Claude Function'] == row['Gemini Function']:
-                            row['Match'] = 'Yes'
+                    if claude_function and gemini_function:
+                        if claude_function == gemini_function:
+                            match = 'Yes'
                         else:
-                            row['Match'] = 'No'
+                            match = 'No'
                     else:
-                        row['Match'] = 'Missing'
+                        match = 'Missing'
                     
-                    results.append(row)
-    
-    return pd.DataFrame(results)
+                    yield (
+                        f"output/{subdir}/step_{step_num}",
+                        iteration if iteration > 0 else '',
+                        claude_function,
+                        claude_parameters,
+                        gemini_function,
+                        gemini_parameters,
+                        match,
+                        token_count if token_count is not None else ''
+                    )
+
+def compare_files(output_dir: str, output_gemini_dir: str) -> pd.DataFrame:
+    """Compare function calls between Claude and Gemini outputs."""
+    return pd.DataFrame.from_records(iter_comparison_rows(output_dir, output_gemini_dir),
+                                     columns=COMPARISON_COLUMNS)
+
+def _display_cell(value: Any) -> str:
+    """Render a cell for the text table, escaping line breaks like pandas' to_string."""
+    return str(value).replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def write_comparison_csv(output_dir: str, output_gemini_dir: str, output_csv: str,
+                         output_txt: Optional[str] = None) -> Dict[str, int]:
+    """
+    Stream the comparison rows to a CSV file without holding them in memory.
+
+    Args:
+        output_dir: Path to Claude output directory
+        output_gemini_dir: Path to Gemini output directory
+        output_csv: Path to output CSV file
+        output_txt: Optional path of a right-aligned text table written from the same pass
+
+    Returns:
+        Row counts per Match value plus the total under 'Total'
+    """
+    counts = {'Yes': 0, 'No': 0, 'Missing': 0, 'Total': 0}
+    match_index = COMPARISON_COLUMNS.index('Match')
+    widths = [len(column) for column in COMPARISON_COLUMNS]
+    # The column widths are only known after the last row, so the text cells are
+    # spooled to a temporary file and padded once the pass is complete
+    with open(output_csv, 'w', encoding='utf-8', newline='') as f, \
+            tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as spool:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        spool_writer = csv.writer(spool)
+        writer.writerow(COMPARISON_COLUMNS)
+        for row in iter_comparison_rows(output_dir, output_gemini_dir):
+            writer.writerow(row)
+            counts[row[match_index]] += 1
+            counts['Total'] += 1
+            if output_txt is not None:
+                cells = [_display_cell(value) for value in row]
+                widths = [max(width, len(cell)) for width, cell in zip(widths, cells)]
+                spool_writer.writerow(cells)
+        
+        if output_txt is not None:
+            spool.seek(0)
+            with open(output_txt, 'w', encoding='utf-8') as txt:
+                txt.write(' '.join(column.rjust(width) for column, width in zip(COMPARISON_COLUMNS, widths)))
+                for cells in csv.reader(spool):
+                    txt.write('\n' + ' '.join(cell.rjust(width) for cell, width in zip(cells, widths)))
+    return counts
 
 def main():
     # Parse command line arguments
@@ -204,26 +284,21 @@ def main():
     output_gemini_dir = args.output_gemini_dir
     output_file = args.output_csv
     
-    # Compare files and create DataFrame
-    df = compare_files(output_dir, output_gemini_dir)
-    
-    # Save to CSV file
-    df.to_csv(output_file, index=False)
-    print(f"Comparison saved to: {output_file}")
-    
     # Also save as a formatted text table
     base_name = os.path.splitext(output_file)[0]
     output_txt = f"{base_name}.txt"
-    with open(output_txt, 'w', encoding='utf-8') as f:
-        f.write(df.to_string(index=False))
+    
+    # Compare files and stream the rows to the CSV file and the text table
+    counts = write_comparison_csv(output_dir, output_gemini_dir, output_file, output_txt)
+    print(f"Comparison saved to: {output_file}")
     print(f"Text table saved to: {output_txt}")
     
     # Print summary statistics
     print("\nSummary Statistics:")
-    print(f"Total comparisons: {len(df)}")
-    print(f"Matching functions: {len(df[df['Match'] == 'Yes'])}")
-    print(f"Non-matching functions: {len(df[df['Match'] == 'No'])}")
-    print(f"Missing functions: {len(df[df['Match'] == 'Missing'])}")
+    print(f"Total comparisons: {counts['Total']}")
+    print(f"Matching functions: {counts['Yes']}")
+    print(f"Non-matching functions: {counts['No']}")
+    print(f"Missing functions: {counts['Missing']}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -105,10 +105,157 @@ This script converts API requests from Claude's format to Gemini's format.
 import argparse
 import json
 import os
-import glob
-import copy
 import re
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+# Claude to Gemini role mapping; unknown roles fall back to "user"
+ROLE_MAPPING = {
+    "user": "user",
+    "assistant": "model",
+    "tool": "model",  # Tool responses are treated as model responses
+}
+
+
+def _text_part(item: Dict[str, Any], tool_use_map: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a Claude text block to a Gemini text part."""
+    return {"text": item.get("text", "")}
+
+
+def _image_part(item: Dict[str, Any], tool_use_map: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a Claude image block to a Gemini inline_data part."""
+    source = item.get("source", {})
+    return {
+        "inline_data": {
+            "mime_type": source.get("media_type", "image/jpeg"),
+            "data": source.get("data", "")
+        }
+    }
+
+
+def _function_call_part(item: Dict[str, Any], tool_use_map: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a Claude tool_use block to a Gemini functionCall part."""
+    # Change "input" to "args" and embrace both in "functionCall" object
+    return {
+        "functionCall": {
+            "name": item.get('name', 'unknown'),
+            "args": item.get('input', {})
+        }
+    }
+
+
+def _function_response_part(item: Dict[str, Any], tool_use_map: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a Claude tool_result block to a Gemini functionResponse part."""
+    # Get function name from the tool_use_map using tool_use_id
+    function_name = tool_use_map.get(item.get('tool_use_id'), 'unknown')
+    # Change "content" to "response" and embrace both name and response in "functionResponse" object
+    return {
+        "functionResponse": {
+            "name": function_name,
+            "response": {
+                "result": item.get('content', '')
+            }
+        }
+    }
+
+
+# Part builders keyed by Claude content block type; other block types are dropped
+CONTENT_PART_BUILDERS = {
+    "text": _text_part,
+    "image": _image_part,
+    "tool_use": _function_call_part,
+    "tool_result": _function_response_part,
+}
+
+
+def _rename_required(parameters: Dict[str, Any], old_name: str, new_name: str) -> None:
+    """Rename an entry of the required array of a parameters schema."""
+    required = parameters.get('required')
+    if required and old_name in required:
+        # The array is shared with the Claude request, so edit a copy of it
+        required = list(required)
+        required[required.index(old_name)] = new_name
+        parameters['required'] = required
+
+
+def _fix_segment_anything(parameters: Dict[str, Any]) -> None:
+    """Fix the segment_anything parameters in place."""
+    # Replace 'object' with 'object_english_name' in required array
+    _rename_required(parameters, 'object', 'object_english_name')
+
+
+def _fix_pira_image2image(parameters: Dict[str, Any]) -> None:
+    """Fix the Pira_image2image parameters in place."""
+    required = parameters.get('required')
+    if required and 'cfg' in required:
+        # Remove 'cfg' from required array as it doesn't exist in properties
+        required = list(required)
+        required.remove('cfg')
+        parameters['required'] = required
+
+
+def _fix_gemini_edit(parameters: Dict[str, Any]) -> None:
+    """Fix the gemini_edit parameters in place."""
+    # Replace 'image' with 'images' in required array
+    _rename_required(parameters, 'image', 'images')
+    
+    # Fix the type of images field from ["array", "null"] to "array"
+    if 'properties' in parameters and 'images' in parameters['properties']:
+        if isinstance(parameters['properties']['images'].get('type'), list):
+            properties = dict(parameters['properties'])
+            properties['images'] = dict(properties['images'], type='array')
+            parameters['properties'] = properties
+
+
+def _fix_outpaint(parameters: Dict[str, Any]) -> None:
+    """Fix the outpaint parameters in place."""
+    # Replace 'prompt' with 'english_prompt' in required array
+    _rename_required(parameters, 'prompt', 'english_prompt')
+
+
+# Parameter fixers for known function declarations, keyed by function name
+FUNCTION_FIXERS = {
+    'segment_anything': _fix_segment_anything,
+    'Pira_image2image': _fix_pira_image2image,
+    'gemini_edit': _fix_gemini_edit,
+    'outpaint': _fix_outpaint,
+}
+
+
+def _loads(data):
+    """Parse a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(data) -> bytes:
+    """Serialize data to indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _iter_json_files(root: str) -> Iterator[str]:
+    """Yield the paths of all JSON files under root, skipping hidden entries like glob does."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.json') and entry.is_file():
+                    yield entry.path
 
 
 class ClaudeToGeminiConverter:
@@ -148,32 +295,32 @@ class ClaudeToGeminiConverter:
                         if tool_use_id and function_name:
                             tool_use_map[tool_use_id] = function_name
 
+        # Bind hot lookups to locals once instead of resolving them per message
+        get_part_builder = CONTENT_PART_BUILDERS.get
+        get_role = ROLE_MAPPING.get
+        append_message = gemini_messages.append
+        
         for message in claude_messages:
             role = message.get("role", "")
             content = message.get("content", "")
             
+            if role == "system":
+                # System messages are handled separately in convert_request
+                continue
+            
             # Map Claude roles to Gemini roles
-            if role == "user":
-                gemini_role = "user"
-            elif role == "assistant":
-                gemini_role = "model"
-            elif role == "tool":
-                # Tool responses should be treated as model responses
-                gemini_role = "model"
+            gemini_role = get_role(role, "user")
+            
+            if role == "tool":
                 # Format tool response
                 tool_name = message.get("name", "tool")
                 tool_content = f"Tool Response ({tool_name}):\n{content}"
                 parts = [{"text": tool_content}]
-                gemini_messages.append({
+                append_message({
                     "role": gemini_role,
                     "parts": parts
                 })
                 continue
-            elif role == "system":
-                # System messages are handled separately in convert_request
-                continue
-            else:
-                gemini_role = "user"  # Default fallback
             
             # Convert content to parts format
             if isinstance(content, str):
@@ -181,52 +328,18 @@ class ClaudeToGeminiConverter:
             elif isinstance(content, list):
                 # Handle multi-modal content
                 parts = []
+                append_part = parts.append
                 for item in content:
                     if isinstance(item, str):
-                        parts.append({"text": item})
+                        append_part({"text": item})
                     elif isinstance(item, dict):
-                        if item.get("type") == "text":
-                            parts.append({"text": item.get("text", "")})
-                        elif item.get("type") == "image":
-                            # Convert image format
-                            parts.append({
-                                "inline_data": {
-                                    "mime_type": item.get("source", {}).get("media_type", "image/jpeg"),
-                                    "data": item.get("source", {}).get("data", "")
-                                }
-                            })
-                        elif item.get("type") == "tool_use":
-                            # Handle function calls
-                            # Extract the "name" and "input" object
-                            function_name = item.get('name', 'unknown')
-                            function_args = item.get('input', {})
-                            # Change "input" to "args" and embrace both in "functionCall" object
-                            parts.append({
-                                "functionCall": {
-                                    "name": function_name,
-                                    "args": function_args
-                                }
-                            })
-                        elif item.get("type") == "tool_result":
-                            # Handle tool results
-                            # Extract the "content" object
-                            content = item.get('content', '')
-                            # Get function name from the tool_use_map using tool_use_id
-                            tool_use_id = item.get('tool_use_id')
-                            function_name = tool_use_map.get(tool_use_id, 'unknown')
-                            # Change "content" to "response" and embrace both name and response in "functionResponse" object
-                            parts.append({
-                                "functionResponse": {
-                                    "name": function_name,
-                                    "response": {
-                                        "result": content
-                                    }
-                                }
-                            })
+                        build_part = get_part_builder(item.get("type"))
+                        if build_part:
+                            append_part(build_part(item, tool_use_map))
             else:
                 parts = [{"text": str(content)}]
             
-            gemini_messages.append({
+            append_message({
                 "role": gemini_role,
                 "parts": parts
             })
@@ -243,77 +356,47 @@ class ClaudeToGeminiConverter:
         if not claude_tools:
             return []
         
-        gemini_functions = []
-        for tool in claude_tools:
-            # Convert input_schema to parameters format
-            input_schema = tool.get("input_schema", {})
-            
-            gemini_function = {
+        # Convert input_schema to parameters format; Gemini uses the same JSON Schema format.
+        # The top level of the schema is copied so fix_request_issues can patch it in place.
+        gemini_functions = [
+            {
                 "name": tool.get("name", ""),
                 "description": tool.get("description", ""),
-                "parameters": input_schema  # Gemini uses the same JSON Schema format
+                "parameters": dict(tool.get("input_schema", {}))
             }
-            
-            gemini_functions.append(gemini_function)
+            for tool in claude_tools
+        ]
         
         return gemini_functions
     
     def fix_request_issues(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fix known issues in the request data during conversion."""
-        # Deep copy to avoid modifying the original
-        fixed_data = copy.deepcopy(request_data)
+        """
+        Fix known issues in the request data during conversion.
+        
+        The request is patched in place: it is built fresh by convert_request, so
+        only the nested schema objects shared with the Claude request are copied.
+        """
+        fixed_data = request_data
         
         # Fix empty parts issue
         if 'contents' in fixed_data and isinstance(fixed_data['contents'], list):
             # Filter out messages with empty parts
             fixed_data['contents'] = [
                 content for content in fixed_data['contents']
-                if 'parts' in content and content['parts'] and len(content['parts']) > 0
+                if content.get('parts')
             ]
         
-        # Check if tools exist in the request
-        if 'tools' in fixed_data and isinstance(fixed_data['tools'], list):
-            for tool in fixed_data['tools']:
-                if 'functionDeclarations' in tool and isinstance(tool['functionDeclarations'], list):
-                    for func in tool['functionDeclarations']:
-                        # Fix parameter mismatches
-                        if func.get('name') == 'segment_anything':
-                            if 'required' in func['parameters'] and 'object' in func['parameters']['required']:
-                                # Replace 'object' with 'object_english_name' in required array
-                                func['parameters']['required'] = [
-                                    'object_english_name' if param == 'object' else param 
-                                    for param in func['parameters']['required']
-                                ]
-                        
-                        elif func.get('name') == 'Pira_image2image':
-                            if 'required' in func['parameters'] and 'cfg' in func['parameters']['required']:
-                                # Remove 'cfg' from required array as it doesn't exist in properties
-                                func['parameters']['required'] = [
-                                    param for param in func['parameters']['required'] 
-                                    if param != 'cfg'
-                                ]
-                        
-                        elif func.get('name') == 'gemini_edit':
-                            # Fix required parameter name
-                            if 'required' in func['parameters'] and 'image' in func['parameters']['required']:
-                                # Replace 'image' with 'images' in required array
-                                func['parameters']['required'] = [
-                                    'images' if param == 'image' else param 
-                                    for param in func['parameters']['required']
-                                ]
-                            
-                            # Fix the type of images field from ["array", "null"] to "array"
-                            if 'properties' in func['parameters'] and 'images' in func['parameters']['properties']:
-                                if isinstance(func['parameters']['properties']['images'].get('type'), list):
-                                    func['parameters']['properties']['images']['type'] = 'array'
-                        
-                        elif func.get('name') == 'outpaint':
-                            if 'required' in func['parameters'] and 'prompt' in func['parameters']['required']:
-                                # Replace 'prompt' with 'english_prompt' in required array
-                                func['parameters']['required'] = [
-                                    'english_prompt' if param == 'prompt' else param 
-                                    for param in func['parameters']['required']
-                                ]
+        # Nothing else to fix when the request has no tools
+        if not fixed_data.get('tools') or not isinstance(fixed_data['tools'], list):
+            return fixed_data
+        
+        for tool in fixed_data['tools']:
+            if 'functionDeclarations' in tool and isinstance(tool['functionDeclarations'], list):
+                for func in tool['functionDeclarations']:
+                    # Fix parameter mismatches
+                    fix_parameters = FUNCTION_FIXERS.get(func.get('name'))
+                    if fix_parameters:
+                        fix_parameters(func['parameters'])
         
         return fixed_data
     
@@ -373,68 +456,87 @@ class ClaudeToGeminiConverter:
         Returns:
             Gemini API request as JSON string
         """
-        claude_request = json.loads(claude_json)
+        claude_request = _loads(claude_json)
         gemini_request = self.convert_request(claude_request)
-        return json.dumps(gemini_request, indent=2)
+        return _dumps(gemini_request).decode('utf-8')
 
 
-    def process_folder(self, input_folder: str, output_folder: str = None):
+    def process_folder(self, input_folder: str, output_folder: str = None, max_workers: int = None):
         """
         Process all JSON files in the input folder and write converted files.
         
         Args:
             input_folder: Path to the folder containing Claude request JSON files
             output_folder: Path to the output folder (defaults to input_gemini)
+            max_workers: Number of worker processes (defaults to the number of CPUs)
         """
         if output_folder is None:
             output_folder = input_folder + "_to_gemini"
         
         # Find all JSON files recursively
-        json_files = glob.glob(os.path.join(input_folder, "**/*.json"), recursive=True)
+        json_files = list(_iter_json_files(input_folder))
         
         print(f"Found {len(json_files)} JSON files to process")
         
         successful = 0
         failed = 0
         
-        for json_file in json_files:
-            try:
-                # Read the Claude request
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    claude_request = json.load(f)
-                
-                # Convert to Gemini format
-                gemini_request = self.convert_request(claude_request)
-                
-                # Create output file path
-                relative_path = os.path.relpath(json_file, input_folder)
-                output_file = os.path.join(output_folder, relative_path)
-                
-                # Add _gemini suffix to filename
-                base_name = os.path.basename(output_file)
-                dir_name = os.path.dirname(output_file)
-                name_without_ext = os.path.splitext(base_name)[0]
-                output_file = os.path.join(dir_name, f"{name_without_ext}_gemini.json")
-                
-                # Create output directory if needed
-                output_dir = os.path.dirname(output_file)
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # Write the converted request
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(gemini_request, f, indent=2, ensure_ascii=False)
-                
-                print(f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}")
-                successful += 1
-                
-            except Exception as e:
-                print(f"✗ Failed to convert {json_file}: {str(e)}")
-                failed += 1
+        # Files are independent, so convert them in parallel and report from the main process
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_convert_file, repeat(self), json_files, repeat(input_folder),
+                                   repeat(output_folder), chunksize=16)
+            for converted, message in results:
+                print(message)
+                if converted:
+                    successful += 1
+                else:
+                    failed += 1
         
         print(f"\nConversion complete: {successful} successful, {failed} failed")
         print(f"Output folder: {output_folder}")
 
 
+def _convert_file(converter: ClaudeToGeminiConverter, json_file: str, input_folder: str,
+                  output_folder: str) -> Tuple[bool, str]:
+    """
+    Convert a single Claude request file and write the Gemini request to the output folder.
+    
+    Runs in a worker process, so the status line is returned instead of printed.
+    
+    Returns:
+        Tuple of (success flag, status message)
+    """
+    try:
+        # Read the Claude request
+        claude_request = _loads(Path(json_file).read_bytes())
+        
+        # Convert to Gemini format
+        gemini_request = converter.convert_request(claude_request)
+        
+        # Create output file path
+        relative_path = os.path.relpath(json_file, input_folder)
+        output_file = os.path.join(output_folder, relative_path)
+        
+        # Add _gemini suffix to filename
+        base_name = os.path.basename(output_file)
+        dir_name = os.path.dirname(output_file)
+        name_without_ext = os.path.splitext(base_name)[0]
+        output_file = os.path.join(dir_name, f"{name_without_ext}_gemini.json")
+        
+        # Create output directory if needed
+        output_dir = os.path.dirname(output_file)
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Write the converted request with a single write of the encoded document
+        with open(output_file, 'wb') as f:
+            f.write(_dumps(gemini_request))
+        
+        return True, f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}"
+        
+    except Exception as e:
+        return False, f"✗ Failed to convert {json_file}: {str(e)}"
+
+
 def main():
     """Process all JSON files in the specified input folder."""
     parser = argparse.ArgumentParser(description='Convert Claude API requests to Gemini format')
@@ -442,10 +544,13 @@ def main():
                         help='Input folder containing Claude request JSON files (default: claude_requests)')
     parser.add_argument('--output_folder', type=str, default=None,
                         help='Output folder for converted files (default: <input_folder>_to_gemini)')
+    parser.add_argument('--max_workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
 
     args = parser.parse_args()
     input_folder = args.input_folder
     output_folder = args.output_folder
+    max_workers = args.max_workers
 
     # Check if input folder exists
     if not os.path.exists(input_folder):
@@ -457,7 +562,7 @@ def main():
     converter = ClaudeToGeminiConverter()
 
     # Process all files in the folder
-    converter.process_folder(input_folder, output_folder)
+    converter.process_folder(input_folder, output_folder, max_workers)
 
 
 if __name__ == "__main__":
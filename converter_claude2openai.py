@@ -73,34 +73,175 @@ This script converts API requests from Claude's format to OpenAI's format.
     "parameters": {...}
 }
 }
+
+5. Model
+
+- Known Claude models are mapped via MODEL_MAPPING; other model names pass through unchanged
 """
 
 import argparse
 import json
+import mmap
 import os
-import glob
-import copy
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from types import MappingProxyType
+from typing import Dict, List, Any, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+# Input files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+# Model mapping from Claude to OpenAI
+MODEL_MAPPING = MappingProxyType({
+    "claude-3-opus-20240229": "gpt-4-turbo-preview",
+    "claude-3-sonnet-20240229": "gpt-4-turbo-preview",
+    "claude-3-haiku-20240307": "gpt-3.5-turbo",
+    "claude-3-5-sonnet-20241022": "gpt-4-turbo-preview",
+    "claude-3-5-haiku-20241022": "gpt-3.5-turbo",
+    # Add more mappings as needed
+})
+
+
+def _rename_required(parameters: Dict[str, Any], old_name: str, new_name: str) -> None:
+    """Rename an entry of the required array of a parameters schema."""
+    required = parameters.get('required')
+    if required and old_name in required:
+        # The array is shared with the Claude request, so edit a copy of it
+        required = list(required)
+        required[required.index(old_name)] = new_name
+        parameters['required'] = required
+
+
+def _fix_segment_anything(parameters: Dict[str, Any]) -> None:
+    """Fix the segment_anything parameters in place."""
+    # Replace 'object' with 'object_english_name' in required array
+    _rename_required(parameters, 'object', 'object_english_name')
+
+
+def _fix_pira_image2image(parameters: Dict[str, Any]) -> None:
+    """Fix the Pira_image2image parameters in place."""
+    required = parameters.get('required')
+    if required and 'cfg' in required:
+        # Remove 'cfg' from required array as it doesn't exist in properties
+        required = list(required)
+        required.remove('cfg')
+        parameters['required'] = required
+
+
+def _fix_gemini_edit(parameters: Dict[str, Any]) -> None:
+    """Fix the gemini_edit parameters in place."""
+    # Replace 'image' with 'images' in required array
+    _rename_required(parameters, 'image', 'images')
+
+    # Fix the type of images field from ["array", "null"] to "array"
+    properties = parameters.get('properties')
+    if properties and 'images' in properties:
+        images = properties['images']
+        if type(images.get('type')) is list:
+            # Both dicts are shared with the Claude request, so replace them with copies
+            properties = dict(properties)
+            properties['images'] = dict(images, type='array')
+            parameters['properties'] = properties
+
+
+def _fix_outpaint(parameters: Dict[str, Any]) -> None:
+    """Fix the outpaint parameters in place."""
+    # Replace 'prompt' with 'english_prompt' in required array
+    _rename_required(parameters, 'prompt', 'english_prompt')
+
+
+# Parameter fixers for known function declarations, keyed by function name
+FUNCTION_FIXERS = {
+    'segment_anything': _fix_segment_anything,
+    'Pira_image2image': _fix_pira_image2image,
+    'gemini_edit': _fix_gemini_edit,
+    'outpaint': _fix_outpaint,
+}
+
+
+def _loads(data):
+    """Parse a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _load_file(path: str):
+    """Parse a JSON file, memory-mapping large files when orjson is available."""
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            # orjson parses straight from the mapped pages, so the file is never copied into a bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return orjson.loads(view)
+        return _loads(f.read())
+
+
+def _dumps(data) -> bytes:
+    """Serialize data to indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write data to a temporary file next to path, then rename it into place."""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Don't leave a partial temporary file behind in the output folder
+        os.unlink(tmp_path)
+        raise
+
+
+def _iter_json_files(root: str) -> Iterator[str]:
+    """Yield the paths of all JSON files under root, skipping hidden entries like glob does."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.json') and entry.is_file():
+                    yield entry.path
+
+
+def _dumps_arguments(data) -> str:
+    """Serialize tool call arguments to a compact JSON string."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
 
 
 class ClaudeToOpenAIConverter:
     """Converts Claude API requests to OpenAI API format."""
 
-    # Model mapping from Claude to OpenAI
-    MODEL_MAPPING = {
-        "claude-3-opus-20240229": "gpt-4-turbo-preview",
-        "claude-3-sonnet-20240229": "gpt-4-turbo-preview",
-        "claude-3-haiku-20240307": "gpt-3.5-turbo",
-        "claude-3-5-sonnet-20241022": "gpt-4-turbo-preview",
-        "claude-3-5-haiku-20241022": "gpt-3.5-turbo",
-        # Add more mappings as needed
-    }
+    __slots__ = ()
+
+    # Kept as a class attribute for existing callers
+    MODEL_MAPPING = MODEL_MAPPING
 
     def __init__(self):
         """Initialize the converter."""
         pass
 
-    def convert_messages(self, claude_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def convert_messages(claude_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Convert Claude message format to OpenAI format.
 
@@ -108,112 +249,111 @@ class ClaudeToOpenAIConverter:
         OpenAI format: {"role": "user/assistant/system", "content": "text"}
         """
         openai_messages = []
+        append_message = openai_messages.append
 
         # Build a mapping of tool_use_id to function name from assistant messages
-        tool_use_map = {}
-        for message in claude_messages:
-            if message.get("role") == "assistant" and isinstance(message.get("content"), list):
-                for item in message["content"]:
-                    if isinstance(item, dict) and item.get("type") == "tool_use":
-                        tool_use_id = item.get("id")
-                        function_name = item.get("name")
-                        if tool_use_id and function_name:
-                            tool_use_map[tool_use_id] = function_name
+        # (messages decoded from JSON hold plain lists and dicts, so exact type checks suffice)
+        tool_use_map = {
+            item["id"]: item["name"]
+            for message in claude_messages
+            if message.get("role") == "assistant" and type(message.get("content")) is list
+            for item in message["content"]
+            if type(item) is dict and item.get("type") == "tool_use" and item.get("id") and item.get("name")
+        }
+        get_tool_name = tool_use_map.get
 
         for message in claude_messages:
             role = message.get("role", "")
             content = message.get("content", "")
 
-            # OpenAI uses the same role names as Claude
+            # Plain text messages carry over unchanged, since OpenAI uses the same role names as Claude
+            if type(content) is str:
+                append_message({
+                    "role": role,
+                    "content": content
+                })
+                continue
+
             openai_role = role
 
             # Convert content to OpenAI format
-            if isinstance(content, str):
-                openai_content = content
-            elif isinstance(content, list):
-                # Handle multi-modal content
+            if type(content) is list:
+                # Classify the multi-modal content in a single pass
                 openai_content_parts = []
+                text_parts = []
+                tool_uses = []
+                tool_results = []
                 for item in content:
-                    if isinstance(item, str):
+                    if type(item) is str:
                         openai_content_parts.append({
                             "type": "text",
                             "text": item
                         })
-                    elif isinstance(item, dict):
-                        if item.get("type") == "text":
+                    elif type(item) is dict:
+                        item_type = item.get("type")
+                        if item_type == "text":
+                            text = item.get("text", "")
+                            text_parts.append(text)
                             openai_content_parts.append({
                                 "type": "text",
-                                "text": item.get("text", "")
+                                "text": text
                             })
-                        elif item.get("type") == "image":
+                        elif item_type == "image":
                             # Convert image format
                             source = item.get("source", {})
-                            if source.get("type") == "base64":
+                            source_type = source.get("type")
+                            if source_type == "base64":
+                                url = "data:" + source.get("media_type", "image/jpeg") + ";base64," + source.get("data", "")
                                 openai_content_parts.append({
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:{source.get('media_type', 'image/jpeg')};base64,{source.get('data', '')}"
+                                        "url": url
                                     }
                                 })
-                            elif source.get("type") == "url":
+                            elif source_type == "url":
                                 openai_content_parts.append({
                                     "type": "image_url",
                                     "image_url": {
                                         "url": source.get("url", "")
                                     }
                                 })
-                        elif item.get("type") == "tool_use":
-                            # Handle function calls - convert to OpenAI function call format
-                            # This will be added to the assistant message in a special way
-                            pass
-                        elif item.get("type") == "tool_result":
-                            # Handle tool results - convert to function response
-                            # This becomes a tool message in OpenAI
-                            pass
+                        elif item_type == "tool_use":
+                            tool_uses.append(item)
+                        elif item_type == "tool_result":
+                            tool_results.append(item)
 
-                if openai_content_parts:
-                    openai_content = openai_content_parts
-                else:
-                    openai_content = str(content)
-            else:
-                openai_content = str(content)
-
-            # Handle tool calls and tool results specially
-            if isinstance(content, list):
-                # Check for tool_use (function calls)
-                tool_uses = [item for item in content if isinstance(item, dict) and item.get("type") == "tool_use"]
+                # Function calls become assistant messages with tool_calls
                 if tool_uses and role == "assistant":
-                    # Create OpenAI function call format
-                    text_content = " ".join([
-                        item.get("text", "") for item in content
-                        if isinstance(item, dict) and item.get("type") == "text"
-                    ])
+                    # Text accompanying the calls, joined once for all of them and skipped when there is none
+                    text_content = (" ".join(text_parts) or None) if text_parts else None
 
                     for tool_use in tool_uses:
-                        openai_messages.append({
+                        tool_use_id = tool_use.get("id", "")
+                        function_name = tool_use.get("name", "")
+                        arguments = _dumps_arguments(tool_use.get("input") or {})
+                        append_message({
                             "role": "assistant",
-                            "content": text_content if text_content else None,
+                            "content": text_content,
                             "tool_calls": [{
-                                "id": tool_use.get("id", ""),
+                                "id": tool_use_id,
                                 "type": "function",
                                 "function": {
-                                    "name": tool_use.get("name", ""),
-                                    "arguments": json.dumps(tool_use.get("input", {}))
+                                    "name": function_name,
+                                    "arguments": arguments
                                 }
                             }]
                         })
                     continue
 
-                # Check for tool_result
-                tool_results = [item for item in content if isinstance(item, dict) and item.get("type") == "tool_result"]
+                # Tool results become tool messages
                 if tool_results:
                     for tool_result in tool_results:
                         content_str = tool_result.get("content", "")
                         # Get function name from the tool_use_map using tool_use_id
                         tool_use_id = tool_result.get("tool_use_id", "")
-                        tool_name = tool_use_map.get(tool_use_id, "unknown")
+                        tool_name = get_tool_name(tool_use_id, "unknown")
 
-                        openai_messages.append({
+                        append_message({
                             "role": "tool",
                             "tool_call_id": tool_use_id,
                             "name": tool_name,
@@ -221,14 +361,22 @@ class ClaudeToOpenAIConverter:
                         })
                     continue
 
-            openai_messages.append({
+                if openai_content_parts:
+                    openai_content = openai_content_parts
+                else:
+                    openai_content = str(content)
+            else:
+                openai_content = str(content)
+
+            append_message({
                 "role": openai_role,
                 "content": openai_content
             })
 
         return openai_messages
 
-    def convert_tools(self, claude_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def convert_tools(claude_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Convert Claude tools (functions) to OpenAI function declarations.
 
@@ -238,72 +386,46 @@ class ClaudeToOpenAIConverter:
         if not claude_tools:
             return []
 
-        openai_tools = []
-        for tool in claude_tools:
-            # Convert input_schema to parameters format
-            input_schema = tool.get("input_schema", {})
-
-            openai_tool = {
+        # Convert input_schema to parameters format; OpenAI uses the same JSON Schema format.
+        # The top level of the schema is copied so fix_request_issues can patch it in place.
+        openai_tools = [
+            {
                 "type": "function",
                 "function": {
                     "name": tool.get("name", ""),
                     "description": tool.get("description", ""),
-                    "parameters": input_schema  # OpenAI uses the same JSON Schema format
+                    "parameters": dict(tool.get("input_schema", {}))
                 }
             }
-
-            openai_tools.append(openai_tool)
+            for tool in claude_tools
+        ]
 
         return openai_tools
 
     def fix_request_issues(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fix known issues in the request data during conversion."""
-        # Deep copy to avoid modifying the original
-        fixed_data = copy.deepcopy(request_data)
-
-        # Check if tools exist in the request
-        if 'tools' in fixed_data and isinstance(fixed_data['tools'], list):
-            for tool in fixed_data['tools']:
-                if 'function' in tool and isinstance(tool['function'], dict):
-                    func = tool['function']
-                    # Fix parameter mismatches
-                    if func.get('name') == 'segment_anything':
-                        if 'parameters' in func and 'required' in func['parameters'] and 'object' in func['parameters']['required']:
-                            # Replace 'object' with 'object_english_name' in required array
-                            func['parameters']['required'] = [
-                                'object_english_name' if param == 'object' else param
-                                for param in func['parameters']['required']
-                            ]
-
-                    elif func.get('name') == 'Pira_image2image':
-                        if 'parameters' in func and 'required' in func['parameters'] and 'cfg' in func['parameters']['required']:
-                            # Remove 'cfg' from required array as it doesn't exist in properties
-                            func['parameters']['required'] = [
-                                param for param in func['parameters']['required']
-                                if param != 'cfg'
-                            ]
-
-                    elif func.get('name') == 'gemini_edit':
-                        # Fix required parameter name
-                        if 'parameters' in func and 'required' in func['parameters'] and 'image' in func['parameters']['required']:
-                            # Replace 'image' with 'images' in required array
-                            func['parameters']['required'] = [
-                                'images' if param == 'image' else param
-                                for param in func['parameters']['required']
-                            ]
-
-                        # Fix the type of images field from ["array", "null"] to "array"
-                        if 'parameters' in func and 'properties' in func['parameters'] and 'images' in func['parameters']['properties']:
-                            if isinstance(func['parameters']['properties']['images'].get('type'), list):
-                                func['parameters']['properties']['images']['type'] = 'array'
-
-                    elif func.get('name') == 'outpaint':
-                        if 'parameters' in func and 'required' in func['parameters'] and 'prompt' in func['parameters']['required']:
-                            # Replace 'prompt' with 'english_prompt' in required array
-                            func['parameters']['required'] = [
-                                'english_prompt' if param == 'prompt' else param
-                                for param in func['parameters']['required']
-                            ]
+        """
+        Fix known issues in the request data during conversion.
+
+        The request is modified in place and returned. Only nested values that are
+        shared with the Claude request are copied before they are changed.
+        """
+        fixed_data = request_data
+
+        # Nothing to fix without a tools list
+        if 'tools' not in fixed_data or type(fixed_data['tools']) is not list:
+            return fixed_data
+
+        for tool in fixed_data['tools']:
+            # convert_tools always emits a function dict
+            func = tool.get('function')
+            if func is None:
+                continue
+            # Fix parameter mismatches
+            name = func.get('name')
+            fix_function = FUNCTION_FIXERS.get(name)
+            params = func.get('parameters')
+            if fix_function and params is not None:
+                fix_function(params)
 
         return fixed_data
 
@@ -329,86 +451,114 @@ class ClaudeToOpenAIConverter:
             "messages": openai_messages
         }
 
+        # Map the model name, passing through models without a known OpenAI equivalent
+        model = claude_request.get("model")
+        if model:
+            openai_request["model"] = MODEL_MAPPING.get(model, model)
+
         # Convert and add tools if present
         if tools:
             openai_tools = self.convert_tools(tools)
             if openai_tools:
                 openai_request["tools"] = openai_tools
 
-        # Apply fixes to the converted request
-        openai_request = self.fix_request_issues(openai_request)
+        # Apply fixes to the converted request in place
+        self.fix_request_issues(openai_request)
 
         return openai_request
 
-    def convert_from_json(self, claude_json: str) -> str:
+    def convert_from_json(self, claude_json: Union[str, bytes]) -> str:
         """
         Convert Claude request from JSON string to OpenAI JSON string.
 
         Args:
-            claude_json: Claude API request as JSON string
+            claude_json: Claude API request as JSON string or UTF-8 bytes
 
         Returns:
             OpenAI API request as JSON string
         """
-        claude_request = json.loads(claude_json)
+        claude_request = _loads(claude_json)
         openai_request = self.convert_request(claude_request)
-        return json.dumps(openai_request, indent=2)
+        return _dumps(openai_request).decode('utf-8')
 
-    def process_folder(self, input_folder: str, output_folder: str = None):
+    def process_folder(self, input_folder: str, output_folder: str = None, max_workers: int = None):
         """
         Process all JSON files in the input folder and write converted files.
 
         Args:
             input_folder: Path to the folder containing Claude request JSON files
             output_folder: Path to the output folder (defaults to input_openai)
+            max_workers: Number of worker processes (defaults to the number of CPUs)
         """
         if output_folder is None:
             output_folder = input_folder + "_to_openai"
 
         # Find all JSON files recursively
-        json_files = glob.glob(os.path.join(input_folder, "**/*.json"), recursive=True)
+        json_files = list(_iter_json_files(input_folder))
 
         print(f"Found {len(json_files)} JSON files to process")
 
         successful = 0
         failed = 0
 
-        for json_file in json_files:
-            try:
-                # Read the Claude request
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    claude_request = json.load(f)
+        # Files are independent, so convert them in parallel and report from the main process
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_convert_file, repeat(self), json_files, repeat(input_folder),
+                                   repeat(output_folder), chunksize=16)
+            for converted, message in results:
+                print(message)
+                if converted:
+                    successful += 1
+                else:
+                    failed += 1
 
-                # Convert to OpenAI format
-                openai_request = self.convert_request(claude_request)
+        print(f"\nConversion complete: {successful} successful, {failed} failed")
+        print(f"Output folder: {output_folder}")
 
-                # Create output file path
-                relative_path = os.path.relpath(json_file, input_folder)
-                output_file = os.path.join(output_folder, relative_path)
 
-                # Add _openai suffix to filename
-                base_name = os.path.basename(output_file)
-                dir_name = os.path.dirname(output_file)
-                name_without_ext = os.path.splitext(base_name)[0]
-                output_file = os.path.join(dir_name, f"{name_without_ext}_openai.json")
+# Output directories already created by this process
+_created_dirs = set()
 
-                # Create output directory if needed
-                output_dir = os.path.dirname(output_file)
-                os.makedirs(output_dir, exist_ok=True)
+def _convert_file(converter: ClaudeToOpenAIConverter, json_file: str, input_folder: str,
+                  output_folder: str) -> Tuple[bool, str]:
+    """
+    Convert a single Claude request file and write the OpenAI request to the output folder.
 
-                # Write the converted request
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(openai_request, f, indent=2, ensure_ascii=False)
+    Runs in a worker process, so the status line is returned instead of printed.
 
-                print(f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}")
-                successful += 1
+    Returns:
+        Tuple of (success flag, status message)
+    """
+    try:
+        # Read the Claude request
+        claude_request = _load_file(json_file)
 
-            except Exception as e:
-                print(f"✗ Failed to convert {json_file}: {str(e)}")
-                failed += 1
+        # Convert to OpenAI format
+        openai_request = converter.convert_request(claude_request)
 
-        print(f"\nConversion complete: {successful} successful, {failed} failed")
-        print(f"Output folder: {output_folder}")
+        # Create output file path
+        relative_path = os.path.relpath(json_file, input_folder)
+        output_file = os.path.join(output_folder, relative_path)
+
+        # Add _openai suffix to filename
+        base_name = os.path.basename(output_file)
+        dir_name = os.path.dirname(output_file)
+        name_without_ext = os.path.splitext(base_name)[0]
+        output_file = os.path.join(dir_name, f"{name_without_ext}_openai.json")
+
+        # Create output directory if this process hasn't already
+        output_dir = os.path.dirname(output_file)
+        if output_dir not in _created_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+            _created_dirs.add(output_dir)
+
+        # Write the converted request
+        _write_atomic(output_file, _dumps(openai_request))
+
+        return True, f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}"
+
+    except Exception as e:
+        return False, f"✗ Failed to convert {json_file}: {str(e)}"
 
 
 def main():
@@ -418,10 +568,13 @@ def main():
                         help='Input folder containing Claude request JSON files (default: claude_requests)')
     parser.add_argument('--output_folder', type=str, default=None,
                         help='Output folder for converted files (default: <input_folder>_to_openai)')
+    parser.add_argument('--max_workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
 
     args = parser.parse_args()
     input_folder = args.input_folder
     output_folder = args.output_folder
+    max_workers = args.max_workers
 
     # Check if input folder exists
     if not os.path.exists(input_folder):
@@ -433,7 +586,7 @@ def main():
     converter = ClaudeToOpenAIConverter()
 
     # Process all files in the folder
-    converter.process_folder(input_folder, output_folder)
+    converter.process_folder(input_folder, output_folder, max_workers)
 
 
 if __name__ == "__main__":
@@ -20,20 +20,178 @@ This script converts API requests from OpenAI's format to Gemini's format.
 import argparse
 import json
 import os
-import glob
-import copy
-import re
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Any, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+# OpenAI to Gemini role mapping; unknown roles fall back to "user"
+ROLE_MAPPING = {
+    "user": "user",
+    "assistant": "model",
+    "tool": "user",  # Tool responses map to user role with functionResponse
+}
+
+
+def _text_part(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an OpenAI text item to a Gemini text part."""
+    return {"text": item.get("text", "")}
+
+
+def _image_part(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert an OpenAI image_url item to a Gemini part, or None for a malformed data URL."""
+    image_url_data = item.get("image_url", {})
+    url = image_url_data.get("url", "")
+
+    # Handle base64 encoded images
+    if url.startswith("data:"):
+        # Extract mime type and base64 data by splitting on the marker,
+        # so the (possibly huge) payload is never scanned by a regex
+        header, separator, base64_data = url.partition(";base64,")
+        mime_type = header[len("data:"):]
+        if separator and mime_type and ";" not in mime_type and base64_data:
+            return {
+                "inline_data": {
+                    "mime_type": mime_type,
+                    "data": base64_data
+                }
+            }
+        return None
+
+    # URL reference
+    return {"text": f"[Image: {url}]"}
+
+
+# Part builders keyed by OpenAI content item type; other item types are dropped
+CONTENT_PART_BUILDERS = {
+    "text": _text_part,
+    "image_url": _image_part,
+}
+
+
+def _rename_required(parameters: Dict[str, Any], old_name: str, new_name: str) -> None:
+    """Rename an entry of the required array of a parameters schema."""
+    required = parameters.get('required')
+    if required and old_name in required:
+        # The array is shared with the OpenAI request, so edit a copy of it
+        required = list(required)
+        required[required.index(old_name)] = new_name
+        parameters['required'] = required
+
+
+def _fix_segment_anything(parameters: Dict[str, Any]) -> None:
+    """Fix the segment_anything parameters in place."""
+    # Replace 'object' with 'object_english_name' in required array
+    _rename_required(parameters, 'object', 'object_english_name')
+
+
+def _fix_pira_image2image(parameters: Dict[str, Any]) -> None:
+    """Fix the Pira_image2image parameters in place."""
+    required = parameters.get('required')
+    if required and 'cfg' in required:
+        # Remove 'cfg' from required array as it doesn't exist in properties
+        required = list(required)
+        required.remove('cfg')
+        parameters['required'] = required
+
+
+def _fix_gemini_edit(parameters: Dict[str, Any]) -> None:
+    """Fix the gemini_edit parameters in place."""
+    # Replace 'image' with 'images' in required array
+    _rename_required(parameters, 'image', 'images')
+
+    # Fix the type of images field from ["array", "null"] to "array"
+    properties = parameters.get('properties')
+    if properties and 'images' in properties:
+        images = properties['images']
+        if isinstance(images.get('type'), list):
+            # Nested schemas may be shared with other declarations, so replace them with copies
+            properties = dict(properties)
+            properties['images'] = dict(images, type='array')
+            parameters['properties'] = properties
+
+
+def _fix_outpaint(parameters: Dict[str, Any]) -> None:
+    """Fix the outpaint parameters in place."""
+    # Replace 'prompt' with 'english_prompt' in required array
+    _rename_required(parameters, 'prompt', 'english_prompt')
+
+
+# Parameter fixers for known function declarations, keyed by function name
+FUNCTION_FIXERS = {
+    'segment_anything': _fix_segment_anything,
+    'Pira_image2image': _fix_pira_image2image,
+    'gemini_edit': _fix_gemini_edit,
+    'outpaint': _fix_outpaint,
+}
+
+
+def _iter_parts(content: List[Any]) -> Iterator[Dict[str, Any]]:
+    """Yield the Gemini parts for a list of OpenAI content items, skipping unsupported ones."""
+    get_part_builder = CONTENT_PART_BUILDERS.get
+    for item in content:
+        if isinstance(item, dict):
+            build_part = get_part_builder(item.get("type"))
+            if build_part:
+                part = build_part(item)
+                if part is not None:
+                    yield part
+        elif isinstance(item, str):
+            yield {"text": item}
+
+
+def _loads(data):
+    """Parse a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps_compact(data) -> bytes:
+    """Serialize data to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _iter_json_files(root: str) -> Iterator[str]:
+    """Yield the paths of all JSON files under root, skipping hidden entries like glob does."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.json') and entry.is_file():
+                    yield entry.path
+
+
+def _dumps(data) -> bytes:
+    """Serialize data to indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
 
 
 class OpenAIToGeminiConverter:
     """Converts OpenAI API requests to Gemini API format."""
 
+    # The converter is stateless, so instances carry no attribute dict
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the converter."""
         pass
 
-    def convert_messages(self, openai_messages: List[Dict[str, Any]]) -> tuple:
+    @staticmethod
+    def convert_messages(openai_messages: List[Dict[str, Any]]) -> tuple:
         """
         Convert OpenAI message format to Gemini format.
 
@@ -46,16 +204,13 @@ class OpenAIToGeminiConverter:
         gemini_contents = []
         system_instruction = None
 
-        # Build a mapping of tool_call_id to tool_name from tool_calls messages
+        # Mapping of tool_call_id to tool_name, filled in as tool_calls messages are converted
+        # (a tool call always precedes its response in OpenAI conversations)
         tool_call_id_to_name = {}
-        for message in openai_messages:
-            if "tool_calls" in message and message["tool_calls"]:
-                for tool_call in message["tool_calls"]:
-                    tool_call_id = tool_call.get("id", "")
-                    function_data = tool_call.get("function", {})
-                    tool_name = function_data.get("name", "")
-                    if tool_call_id and tool_name:
-                        tool_call_id_to_name[tool_call_id] = tool_name
+
+        get_role = ROLE_MAPPING.get
+        # Parser for tool call arguments, resolved once instead of per call
+        loads = orjson.loads if orjson is not None else json.loads
 
         for message in openai_messages:
             role = message.get("role", "")
@@ -70,32 +225,29 @@ class OpenAIToGeminiConverter:
                 continue
 
             # Map OpenAI roles to Gemini roles
-            if role == "user":
-                gemini_role = "user"
-            elif role == "assistant":
-                gemini_role = "model"
-            elif role == "tool":
-                # Tool responses map to user role with functionResponse
-                gemini_role = "user"
-            else:
-                gemini_role = "user"  # Default fallback
+            gemini_role = get_role(role, "user")
 
             # Handle tool calls (from assistant)
             if "tool_calls" in message and message["tool_calls"]:
                 parts = []
                 for tool_call in message["tool_calls"]:
                     function_data = tool_call.get("function", {})
+                    tool_call_id = tool_call.get("id", "")
+                    tool_name = function_data.get("name", "")
+                    if tool_call_id and tool_name:
+                        tool_call_id_to_name[tool_call_id] = tool_name
+
                     args = function_data.get("arguments", "{}")
                     # Parse arguments if it's a string
                     if isinstance(args, str):
                         try:
-                            args = json.loads(args)
-                        except:
+                            args = loads(args)
+                        except ValueError:  # also covers orjson.JSONDecodeError
                             args = {}
 
                     parts.append({
                         "functionCall": {
-                            "name": function_data.get("name", ""),
+                            "name": tool_name,
                             "args": args
                         }
                     })
@@ -135,37 +287,11 @@ class OpenAIToGeminiConverter:
                 parts = [{"text": content}]
             elif isinstance(content, list):
                 # Handle multi-modal content
-                parts = []
-                for item in content:
-                    if isinstance(item, dict):
-                        if item.get("type") == "text":
-                            parts.append({"text": item.get("text", "")})
-                        elif item.get("type") == "image_url":
-                            # Convert image format
-                            image_url_data = item.get("image_url", {})
-                            url = image_url_data.get("url", "")
-
-                            # Handle base64 encoded images
-                            if url.startswith("data:"):
-                                # Extract mime type and base64 data
-                                match = re.match(r'data:([^;]+);base64,(.+)', url)
-                                if match:
-                                    mime_type = match.group(1)
-                                    base64_data = match.group(2)
-                                    parts.append({
-                                        "inline_data": {
-                                            "mime_type": mime_type,
-                                            "data": base64_data
-                                        }
-                                    })
-                            else:
-                                # URL reference
-                                parts.append({"text": f"[Image: {url}]"})
-                    elif isinstance(item, str):
-                        parts.append({"text": item})
+                parts = list(_iter_parts(content))
             else:
                 parts = [{"text": str(content)}]
 
+            # Contents with empty parts are dropped here, so the request never needs filtering
             if parts:
                 gemini_contents.append({
                     "role": gemini_role,
@@ -184,8 +310,9 @@ class OpenAIToGeminiConverter:
         if not isinstance(schema, dict):
             return schema
 
-        # Create a copy to avoid modifying the original
-        schema_copy = copy.deepcopy(schema)
+        # Copy only this level; the nested schemas below are rebuilt by the recursive calls
+        # and every other value is shared with the original, which is never modified
+        schema_copy = dict(schema)
 
         # Convert enum values if present
         if "enum" in schema_copy and isinstance(schema_copy["enum"], list):
@@ -220,9 +347,15 @@ class OpenAIToGeminiConverter:
         for tool in openai_tools:
             if tool.get("type") == "function":
                 function_data = tool.get("function", {})
+                name = function_data.get("name", "")
+                # convert_enum_values returns a new top level, which the known fixes patch in place
                 parameters = self.convert_enum_values(function_data.get("parameters", {}))
+                if isinstance(parameters, dict):
+                    fix_parameters = FUNCTION_FIXERS.get(name)
+                    if fix_parameters:
+                        fix_parameters(parameters)
                 function_declarations.append({
-                    "name": function_data.get("name", ""),
+                    "name": name,
                     "description": function_data.get("description", ""),
                     "parameters": parameters
                 })
@@ -235,17 +368,22 @@ class OpenAIToGeminiConverter:
         return []
 
     def fix_request_issues(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fix known issues in the request data during conversion."""
-        # Deep copy to avoid modifying the original
-        fixed_data = copy.deepcopy(request_data)
+        """
+        Fix known issues in an already converted Gemini request.
+
+        convert_request doesn't call this: convert_messages drops empty parts and
+        convert_tools runs FUNCTION_FIXERS inline. It is kept for requests built
+        elsewhere. The request is modified in place and returned. Values that may be
+        shared with the OpenAI request are replaced rather than modified.
+        """
+        fixed_data = request_data
 
         # Fix empty parts issue
         if 'contents' in fixed_data and isinstance(fixed_data['contents'], list):
-            # Filter out messages with empty parts
-            fixed_data['contents'] = [
-                content for content in fixed_data['contents']
-                if 'parts' in content and content['parts'] and len(content['parts']) > 0
-            ]
+            contents = fixed_data['contents']
+            # Filter out messages with empty parts, rebuilding the list only if there are any
+            if not all(content.get('parts') for content in contents):
+                fixed_data['contents'] = [content for content in contents if content.get('parts')]
 
         # Check if tools exist in the request
         if 'tools' in fixed_data and isinstance(fixed_data['tools'], list):
@@ -253,43 +391,9 @@ class OpenAIToGeminiConverter:
                 if 'functionDeclarations' in tool and isinstance(tool['functionDeclarations'], list):
                     for func in tool['functionDeclarations']:
                         # Fix parameter mismatches
-                        if func.get('name') == 'segment_anything':
-                            if 'required' in func['parameters'] and 'object' in func['parameters']['required']:
-                                # Replace 'object' with 'object_english_name' in required array
-                                func['parameters']['required'] = [
-                                    'object_english_name' if param == 'object' else param
-                                    for param in func['parameters']['required']
-                                ]
-
-                        elif func.get('name') == 'Pira_image2image':
-                            if 'required' in func['parameters'] and 'cfg' in func['parameters']['required']:
-                                # Remove 'cfg' from required array as it doesn't exist in properties
-                                func['parameters']['required'] = [
-                                    param for param in func['parameters']['required']
-                                    if param != 'cfg'
-                                ]
-
-                        elif func.get('name') == 'gemini_edit':
-                            # Fix required parameter name
-                            if 'required' in func['parameters'] and 'image' in func['parameters']['required']:
-                                # Replace 'image' with 'images' in required array
-                                func['parameters']['required'] = [
-                                    'images' if param == 'image' else param
-                                    for param in func['parameters']['required']
-                                ]
-
-                            # Fix the type of images field from ["array", "null"] to "array"
-                            if 'properties' in func['parameters'] and 'images' in func['parameters']['properties']:
-                                if isinstance(func['parameters']['properties']['images'].get('type'), list):
-                                    func['parameters']['properties']['images']['type'] = 'array'
-
-                        elif func.get('name') == 'outpaint':
-                            if 'required' in func['parameters'] and 'prompt' in func['parameters']['required']:
-                                # Replace 'prompt' with 'english_prompt' in required array
-                                func['parameters']['required'] = [
-                                    'english_prompt' if param == 'prompt' else param
-                                    for param in func['parameters']['required']
-                                ]
+                        fix_parameters = FUNCTION_FIXERS.get(func.get('name'))
+                        if fix_parameters:
+                            fix_parameters(func['parameters'])
 
         return fixed_data
 
@@ -325,85 +429,107 @@ class OpenAIToGeminiConverter:
             if gemini_tools:
                 gemini_request["tools"] = gemini_tools
 
-        # Apply fixes to the converted request
-        gemini_request = self.fix_request_issues(gemini_request)
-
+        # Known issues are fixed while converting: convert_messages never emits empty parts and
+        # convert_tools applies FUNCTION_FIXERS, so fix_request_issues isn't needed here
         return gemini_request
 
-    def convert_from_json(self, openai_json: str) -> str:
+    def convert_from_json(self, openai_json: Union[str, bytes], pretty: bool = True) -> str:
         """
         Convert OpenAI request from JSON string to Gemini JSON string.
 
         Args:
-            openai_json: OpenAI API request as JSON string
+            openai_json: OpenAI API request as JSON string or UTF-8 bytes
+            pretty: Indent the output; pass False for compact JSON that is only passed on to code
 
         Returns:
             Gemini API request as JSON string
         """
-        openai_request = json.loads(openai_json)
+        openai_request = _loads(openai_json)
         gemini_request = self.convert_request(openai_request)
-        return json.dumps(gemini_request, indent=2)
+        if pretty:
+            return _dumps(gemini_request).decode('utf-8')
+        return _dumps_compact(gemini_request).decode('utf-8')
 
-    def process_folder(self, input_folder: str, output_folder: str = None):
+    def process_folder(self, input_folder: str, output_folder: str = None, max_workers: int = None):
         """
         Process all JSON files in the input folder and write converted files.
 
         Args:
             input_folder: Path to the folder containing OpenAI request JSON files
             output_folder: Path to the output folder (defaults to input_gemini_from_openai)
+            max_workers: Number of worker processes (defaults to the number of CPUs)
         """
         if output_folder is None:
             output_folder = input_folder + "_to_gemini"
 
         # Find all JSON files recursively
-        json_files = glob.glob(os.path.join(input_folder, "**/*.json"), recursive=True)
+        json_files = list(_iter_json_files(input_folder))
 
         print(f"Found {len(json_files)} JSON files to process")
 
         successful = 0
         failed = 0
 
-        for json_file in json_files:
-            try:
-                # Read the OpenAI request
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    openai_request = json.load(f)
+        # Files are independent, so convert them in parallel and report from the main process
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_convert_file, repeat(self), json_files, repeat(input_folder),
+                                   repeat(output_folder), chunksize=16)
+            for converted, message in results:
+                print(message)
+                if converted:
+                    successful += 1
+                else:
+                    failed += 1
 
-                # Convert to Gemini format
-                gemini_request = self.convert_request(openai_request)
+        print(f"\nConversion complete: {successful} successful, {failed} failed")
+        print(f"Output folder: {output_folder}")
 
-                # Create output file path
-                relative_path = os.path.relpath(json_file, input_folder)
-                output_file = os.path.join(output_folder, relative_path)
 
-                # Replace _openai suffix with _gemini_from_openai
-                base_name = os.path.basename(output_file)
-                dir_name = os.path.dirname(output_file)
-                name_without_ext = os.path.splitext(base_name)[0]
+def _convert_file(converter: OpenAIToGeminiConverter, json_file: str, input_folder: str,
+                  output_folder: str) -> Tuple[bool, str]:
+    """
+    Convert a single OpenAI request file and write the Gemini request to the output folder.
 
-                # Remove _openai suffix if present
-                if name_without_ext.endswith("_openai"):
-                    name_without_ext = name_without_ext[:-len("_openai")]
+    Runs in a worker process, so the status line is returned instead of printed.
 
-                output_file = os.path.join(dir_name, f"{name_without_ext}_gemini_from_openai.json")
+    Returns:
+        Tuple of (success flag, status message)
+    """
+    try:
+        # Read the OpenAI request
+        with open(json_file, 'rb') as f:
+            openai_request = _loads(f.read())
 
-                # Create output directory if needed
-                output_dir = os.path.dirname(output_file)
-                os.makedirs(output_dir, exist_ok=True)
+        # Convert to Gemini format
+        gemini_request = converter.convert_request(openai_request)
 
-                # Write the converted request
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(gemini_request, f, indent=2, ensure_ascii=False)
+        # Create output file path
+        relative_path = os.path.relpath(json_file, input_folder)
+        output_file = os.path.join(output_folder, relative_path)
 
-                print(f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}")
-                successful += 1
+        # Replace _openai suffix with _gemini_from_openai
+        base_name = os.path.basename(output_file)
+        dir_name = os.path.dirname(output_file)
+        name_without_ext = os.path.splitext(base_name)[0]
 
-            except Exception as e:
-                print(f"✗ Failed to convert {json_file}: {str(e)}")
-                failed += 1
+        # Remove _openai suffix if present
+        if name_without_ext.endswith("_openai"):
+            name_without_ext = name_without_ext[:-len("_openai")]
 
-        print(f"\nConversion complete: {successful} successful, {failed} failed")
-        print(f"Output folder: {output_folder}")
+        output_file = os.path.join(dir_name, f"{name_without_ext}_gemini_from_openai.json")
+
+        # Create output directory if needed
+        output_dir = os.path.dirname(output_file)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Write the converted request
+        with open(output_file, 'wb') as f:
+            f.write(_dumps(gemini_request))
+
+        return True, f"✓ Converted: {relative_path} -> {os.path.relpath(output_file, output_folder)}"
+
+    except Exception as e:
+        return False, f"✗ Failed to convert {json_file}: {str(e)}"
 
 
 def main():
@@ -413,10 +539,13 @@ def main():
                         help='Input folder containing OpenAI request JSON files (default: openai_requests)')
     parser.add_argument('--output_folder', type=str, default=None,
                         help='Output folder for converted files (default: <input_folder>_to_gemini)')
+    parser.add_argument('--max_workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
 
     args = parser.parse_args()
     input_folder = args.input_folder
     output_folder = args.output_folder
+    max_workers = args.max_workers
 
     # Check if input folder exists
     if not os.path.exists(input_folder):
@@ -428,7 +557,7 @@ def main():
     converter = OpenAIToGeminiConverter()
 
     # Process all files in the folder
-    converter.process_folder(input_folder, output_folder)
+    converter.process_folder(input_folder, output_folder, max_workers)
 
 
 if __name__ == "__main__":
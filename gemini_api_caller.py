@@ -6,20 +6,86 @@ This script reads Gemini-formatted requests from input_gemini folder,
 calls the Gemini API using REST endpoints, and stores results in output_gemini folder.
 """
 
+import datetime
+import gzip
+import hashlib
 import json
 import os
+import threading
 import time
 import copy
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import Dict, Any, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+def _loads(data):
+    """Parse a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(data) -> bytes:
+    """Serialize data to indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _dumps_compact(data) -> bytes:
+    """Serialize data to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter that allows bursts of up to capacity requests."""
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the token bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens the bucket holds (starts full)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
 
 class GeminiAPICaller:
     """Calls Gemini API with converted requests."""
     
     def __init__(self, credentials=None, fc2=True, function_call_mode="auto", project="cloud-llm-preview4",
-                 model_name="gemini-2.5-pro", openai_endpoint=False, location="global"):
+                 model_name="gemini-2.5-pro", openai_endpoint=False, location="global", rpm=60,
+                 gzip_requests=False, use_cache=False, output_mode="files"):
         """
         Initialize the Gemini API caller.
 
@@ -31,6 +97,11 @@ class GeminiAPICaller:
             model_name: Model name to use (default: "gemini-2.5-pro")
             openai_endpoint: Use OpenAI-compatible endpoint if True (default: False)
             location: GCP location/region (default: "global")
+            rpm: Maximum requests per minute, 0 disables the limit (default: 60)
+            gzip_requests: Send request bodies gzip-compressed (default: False)
+            use_cache: Reuse successful results cached in the output folder's .cache directory (default: False)
+            output_mode: "files" writes one JSON file per request, "jsonl" appends one line per
+                request to a JSONL file per subfolder (default: "files")
         """
         self.project = project
         self.model_name = model_name
@@ -61,6 +132,48 @@ class GeminiAPICaller:
         self.credentials = credentials
         self.api_key = None  # Will be set when needed
         self.fc2 = fc2  # Store fc2 setting for labels
+        self.gzip_requests = gzip_requests
+        self.use_cache = use_cache
+        self.output_mode = output_mode
+
+        # Reuse connections across calls so each request doesn't pay for a new TCP + TLS handshake.
+        # Rate limits and transient server errors are retried on the pooled connection with
+        # exponential backoff; once retries run out the last response is returned and
+        # raise_for_status reports it like any other HTTP error. Read errors are never retried:
+        # the request may already have been processed (and billed), and a read timeout must
+        # still surface as Timeout
+        retry = Retry(
+            total=5,
+            connect=2,
+            read=False,
+            status=5,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=retry))
+
+        # Token currently set in the session's Authorization header; the lock keeps
+        # concurrent calls from refreshing the credentials at the same time
+        self._token = None
+        self._token_lock = threading.Lock()
+
+        # Shared by all worker threads so the request rate stays within the quota
+        self._limiter = TokenBucket(rate=rpm / 60.0, capacity=rpm) if rpm > 0 else None
+
+        # Output directories already created; adding to a set is atomic, and a race only
+        # repeats an exist_ok makedirs, so the worker threads can share it without a lock
+        self._created_dirs = set()
+
+        # Label fields that only depend on the call settings, keyed by (function_call_mode, thinking_budget)
+        self._base_labels = {}
+
+    def close(self):
+        """Close the HTTP session and its pooled connections."""
+        self._session.close()
         
     def fix_request_issues(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Fix known issues in the request data before sending to Gemini API."""
@@ -121,17 +234,33 @@ class GeminiAPICaller:
         
         return fixed_data
     
+    def _token_expiring(self) -> bool:
+        """Check whether the cached access token is missing or expires within a minute."""
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return True
+        # google-auth reports expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds() <= 60
+
     def get_access_token(self):
-        """Get access token from credentials."""
-        if self.credentials:
-            # Refresh the credentials if needed
-            import google.auth.transport.requests
-            request = google.auth.transport.requests.Request()
-            self.credentials.refresh(request)
-            return self.credentials.token
-        else:
-            # Fallback to hardcoded token if no credentials
-            return self.api_key
+        """Get access token from credentials and set it on the HTTP session."""
+        with self._token_lock:
+            if self.credentials:
+                # Access tokens last about an hour, so only refresh when close to expiry
+                if self._token_expiring():
+                    import google.auth.transport.requests
+                    request = google.auth.transport.requests.Request()
+                    self.credentials.refresh(request)
+                token = self.credentials.token
+            else:
+                # Fallback to hardcoded token if no credentials
+                token = self.api_key
+
+            if token != self._token:
+                self._token = token
+                self._session.headers["Authorization"] = f"Bearer {token}"
+            return token
     
     def call_gemini(self, request: Dict[str, Any], function_call_mode: str = "auto", thinking_budget: int = 0, 
                     session_id: str = None, iteration: int = 1, step_id: str = None) -> Dict[str, Any]:
@@ -149,6 +278,9 @@ class GeminiAPICaller:
         Returns:
             Response dictionary
         """
+        # Format the timestamp once; it is used for the labels and for the result
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+        
         try:
             # Fix known issues in the request before processing
             # fixed_request = self.fix_request_issues(request)
@@ -175,33 +307,46 @@ class GeminiAPICaller:
             
             # Add labels with timestamp, session_id, step_id, iteration, and configuration settings
             if session_id:
+                base_labels = self._base_labels.get((function_call_mode, thinking_budget))
+                if base_labels is None:
+                    base_labels = self._base_labels[(function_call_mode, thinking_budget)] = {
+                        "fc2": str(self.fc2).lower(),
+                        "function_call_mode": function_call_mode,
+                        "thinking_budget": str(thinking_budget)
+                    }
                 request['labels'] = {
-                    "ts": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
+                    "ts": timestamp,
                     "session_id": session_id,
                     "step_id": step_id if step_id else "",
                     "iteration": str(iteration),
-                    "fc2": str(self.fc2).lower(),
-                    "function_call_mode": function_call_mode,
-                    "thinking_budget": str(thinking_budget)
+                    **base_labels
                 }
             
-            # Get access token
-            access_token = self.get_access_token()
+            # Make sure the session carries a current access token
+            self.get_access_token()
             
             # Add API key to the URL
             url = self.base_url
             
-            # Prepare headers
+            # Prepare headers; Authorization is set on the session by get_access_token
             headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}"
+                "Content-Type": "application/json"
             }
             
-            # Make the API request
-            response = requests.post(
+            # Serialize the request ourselves so the body can be compressed; long tool
+            # histories shrink several times over with gzip
+            body = _dumps_compact(request)
+            if self.gzip_requests:
+                body = gzip.compress(body, compresslevel=6)
+                headers["Content-Encoding"] = "gzip"
+            
+            # Wait for the rate limiter before making the API request
+            if self._limiter is not None:
+                self._limiter.acquire()
+            response = self._session.post(
                 url,
                 headers=headers,
-                json=request,
+                data=body,
                 timeout=120  # 2 minute timeout
             )
             
@@ -209,7 +354,7 @@ class GeminiAPICaller:
             response.raise_for_status()
             
             # Parse the response
-            response_data = response.json()
+            response_data = _loads(response.content)
 
             # Handle OpenAI endpoint response format
             if self.openai_endpoint:
@@ -222,7 +367,7 @@ class GeminiAPICaller:
                         "response": choice,
                         "model": response_data.get("model", self.model_name),
                         "finish_reason": choice.get("finish_reason", "stop"),
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
+                        "timestamp": timestamp,
                         # "raw_response": response_data
                     }
 
@@ -235,25 +380,19 @@ class GeminiAPICaller:
                     return {
                         "error": "No choices in OpenAI response",
                         "error_type": "InvalidResponse",
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
+                        "timestamp": timestamp,
                         "raw_response": response_data
                     }
 
             # Handle Gemini endpoint response format
             else:
-                # Extract the generated text from the response
-                generated_text = ""
+                # The whole first candidate is stored in the result, so only its finish reason is needed here
+                candidate = None
                 finish_reason = "STOP"
 
                 if "candidates" in response_data and response_data["candidates"]:
                     candidate = response_data["candidates"][0]
 
-                    # Extract text from content parts
-                    if "content" in candidate and "parts" in candidate["content"]:
-                        for part in candidate["content"]["parts"]:
-                            if "text" in part:
-                                generated_text += part["text"]
-
                     # Get finish reason
                     if "finishReason" in candidate:
                         finish_reason = candidate["finishReason"]
@@ -265,16 +404,24 @@ class GeminiAPICaller:
                         return {
                             "error": f"Prompt was blocked: {feedback['blockReason']}",
                             "error_type": "PromptBlocked",
-                            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
+                            "timestamp": timestamp,
                             "raw_response": response_data
                         }
 
+                if candidate is None:
+                    return {
+                        "error": "No candidates in Gemini response",
+                        "error_type": "InvalidResponse",
+                        "timestamp": timestamp,
+                        "raw_response": response_data
+                    }
+
                 # Format successful response
                 result = {
-                    "response": response_data["candidates"][0],
+                    "response": candidate,
                     "model": "gemini-2.5-pro",
                     "finish_reason": finish_reason,
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
+                    "timestamp": timestamp,
                     # "raw_response":response_data
                 }
 
@@ -291,23 +438,24 @@ class GeminiAPICaller:
                 "error": error_message,
                 "error_type": "HTTPError",
                 "status_code": e.response.status_code,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+                "timestamp": timestamp
             }
         except requests.exceptions.Timeout:
             return {
                 "error": "Request timed out after 120 seconds",
                 "error_type": "Timeout",
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+                "timestamp": timestamp
             }
         except Exception as e:
             # Return error response for any other exception
             return {
                 "error": str(e),
                 "error_type": type(e).__name__,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+                "timestamp": timestamp
             }
     
-    def process_folder(self, input_folder: str, output_folder: str, iteration: int = 1, function_call_mode: str = "auto", thinking_budget: int = 0):
+    def process_folder(self, input_folder: str, output_folder: str, iteration: int = 1, function_call_mode: str = "auto", thinking_budget: int = 0,
+                       concurrency: int = 1):
         """
         Process all JSON files in the input folder and save results.
         Processes subfolder by subfolder, with files in alphabetical order.
@@ -318,114 +466,196 @@ class GeminiAPICaller:
             iteration: Current iteration number
             function_call_mode: Function calling mode - "auto", "any", "validated" (default: "auto")
             thinking_budget: Thinking budget value. If 0 or not set, generationConfig is not added (default: 0)
+            concurrency: Number of requests sent in parallel (default: 1)
         """
         # Create output folder if it doesn't exist
         os.makedirs(output_folder, exist_ok=True)
         
-        # Get all subfolders
-        subfolders = []
+        # Collect the JSON files of every subfolder in a single walk, sorted alphabetically
+        folder_to_files = {}
         for root, _, files in os.walk(input_folder):
-            # Skip the root folder if it has no JSON files
-            json_files_in_folder = [f for f in files if f.endswith('.json')]
+            # Skip folders that have no JSON files
+            json_files_in_folder = sorted(f for f in files if f.endswith('.json'))
             if json_files_in_folder:
-                subfolders.append(root)
-        
-        # Sort subfolders alphabetically
-        subfolders.sort()
+                folder_to_files[root] = [os.path.join(root, f) for f in json_files_in_folder]
         
-        print(f"Found {len(subfolders)} folders to process")
+        print(f"Found {len(folder_to_files)} folders to process")
         
         total_successful = 0
         total_failed = 0
         total_files = 0
         
-        # Process each subfolder
-        for folder_idx, subfolder in enumerate(subfolders, 1):
-            # Get relative subfolder path for display
-            relative_subfolder = os.path.relpath(subfolder, input_folder)
-            if relative_subfolder == ".":
-                relative_subfolder = "root"
+        # The calls are network-bound, so a thread pool overlaps their waiting time
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Process each subfolder
+            for folder_idx, (subfolder, json_files) in enumerate(sorted(folder_to_files.items()), 1):
+                # Get relative subfolder path for display
+                relative_subfolder = os.path.relpath(subfolder, input_folder)
+                if relative_subfolder == ".":
+                    relative_subfolder = "root"
+                
+                print(f"\n{'='*60}")
+                print(f"Processing subfolder {folder_idx}/{len(folder_to_files)}: {relative_subfolder}")
+                print(f"{'='*60}")
+                
+                print(f"Found {len(json_files)} JSON files in this subfolder")
+                
+                successful = 0
+                failed = 0
+                
+                # In jsonl mode all results of the subfolder are appended to a single file
+                jsonl_file = None
+                if self.output_mode == "jsonl":
+                    jsonl_path = os.path.join(output_folder, f"{relative_subfolder}.jsonl")
+                    os.makedirs(os.path.dirname(jsonl_path), exist_ok=True)
+                    jsonl_file = open(jsonl_path, 'ab')
+                
+                try:
+                    # Process the files of the subfolder concurrently; results come back in file order
+                    results = executor.map(self._process_file, range(1, len(json_files) + 1), json_files,
+                                           repeat(len(json_files)), repeat(subfolder), repeat(input_folder),
+                                           repeat(output_folder), repeat(iteration), repeat(function_call_mode),
+                                           repeat(thinking_budget))
+                    for succeeded, lines, record in results:
+                        if record is not None:
+                            jsonl_file.write(record + b"\n")
+                        for line in lines:
+                            print(line)
+                        if succeeded:
+                            successful += 1
+                        else:
+                            failed += 1
+                finally:
+                    if jsonl_file is not None:
+                        jsonl_file.close()
+                
+                # Update totals
+                total_successful += successful
+                total_failed += failed
+                total_files += len(json_files)
+                
+                print(f"\nSubfolder summary: {successful} successful, {failed} failed")
+        
+        print(f"\n{'='*60}")
+        print(f"Overall processing complete:")
+        print(f"  Total files: {total_files}")
+        print(f"  Successful: {total_successful}")
+        print(f"  Failed: {total_failed}")
+        print(f"{'='*60}")
+
+
+    def _process_file(self, index: int, json_file: str, total: int, subfolder: str, input_folder: str, output_folder: str,
+                      iteration: int, function_call_mode: str,
+                      thinking_budget: int) -> Tuple[bool, List[str], Optional[bytes]]:
+        """
+        Call the Gemini API for one request file and write the result.
+
+        Runs in a worker thread, so the log lines are returned instead of printed. In jsonl
+        output mode the result is returned as a JSONL record for process_folder to append.
+
+        Returns:
+            Tuple of (success flag, log lines, JSONL record or None)
+        """
+        lines = []
+        try:
+            lines.append(f"\n  Processing file {index}/{total}: {os.path.basename(json_file)}")
             
-            print(f"\n{'='*60}")
-            print(f"Processing subfolder {folder_idx}/{len(subfolders)}: {relative_subfolder}")
-            print(f"{'='*60}")
+            # Read the Gemini request
+            with open(json_file, 'rb') as f:
+                raw_request = f.read()
+            gemini_request = _loads(raw_request)
+            relative_path = os.path.relpath(json_file, input_folder)
             
-            # Find all JSON files in this subfolder (not recursive)
-            json_files = []
-            for file in os.listdir(subfolder):
-                if file.endswith('.json'):
-                    json_files.append(os.path.join(subfolder, file))
+            # Extract session_id from the subfolder path
+            # The subfolder name is the last part of the path (e.g., "0f6e4002-149c-4105-8299-2c4b364908a6_3602")
+            session_id = os.path.basename(subfolder)
             
-            # Sort files alphabetically
-            json_files.sort()
+            # Extract step_id from the filename (e.g., "step_0_gemini.json" -> "step_0_gemini")
+            step_id = os.path.splitext(os.path.basename(json_file))[0]
             
-            print(f"Found {len(json_files)} JSON files in this subfolder")
+            # Reuse a successful result of an identical earlier call instead of calling the API again
+            cache_path = None
+            result = None
+            if self.use_cache:
+                cache_path = self._cache_path(output_folder, relative_path, raw_request, iteration, function_call_mode,
+                                              thinking_budget)
+                result = self._read_cache(cache_path)
+            cached = result is not None
             
-            successful = 0
-            failed = 0
+            if not cached:
+                # Call Gemini API
+                lines.append("    Calling Gemini API...")
+                result = self.call_gemini(gemini_request.copy(), function_call_mode, thinking_budget, session_id, iteration, step_id)  # Use copy to preserve original
             
-            # Process each file in the subfolder
-            for i, json_file in enumerate(json_files, 1):
-                try:
-                    print(f"\n  Processing file {i}/{len(json_files)}: {os.path.basename(json_file)}")
-                    
-                    # Read the Gemini request
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        gemini_request = json.load(f)
-                    
-                    # Extract session_id from the subfolder path
-                    # The subfolder name is the last part of the path (e.g., "0f6e4002-149c-4105-8299-2c4b364908a6_3602")
-                    session_id = os.path.basename(subfolder)
-                    
-                    # Extract step_id from the filename (e.g., "step_0_gemini.json" -> "step_0_gemini")
-                    step_id = os.path.splitext(os.path.basename(json_file))[0]
-                    
-                    # Call Gemini API
-                    print("    Calling Gemini API...")
-                    result = self.call_gemini(gemini_request.copy(), function_call_mode, thinking_budget, session_id, iteration, step_id)  # Use copy to preserve original
-                    
-                    # Create output file path with iteration number
-                    relative_path = os.path.relpath(json_file, input_folder)
-                    # Add iteration number to filename
-                    base_name, ext = os.path.splitext(relative_path)
-                    output_filename = f"{base_name}_{iteration}{ext}"
-                    output_file = os.path.join(output_folder, output_filename)
-                    
-                    # Create output directory if needed
-                    output_dir = os.path.dirname(output_file)
+            record = None
+            data = None
+            if self.output_mode == "jsonl":
+                record = _dumps_compact({"step_id": step_id, "iteration": iteration, "result": result})
+            else:
+                # Create output file path with iteration number
+                # Add iteration number to filename
+                base_name, ext = os.path.splitext(relative_path)
+                output_filename = f"{base_name}_{iteration}{ext}"
+                output_file = os.path.join(output_folder, output_filename)
+                
+                # Create output directory if it hasn't been created yet
+                output_dir = os.path.dirname(output_file)
+                if output_dir not in self._created_dirs:
                     os.makedirs(output_dir, exist_ok=True)
-                    
-                    # Write the result
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, indent=2, ensure_ascii=False)
-                    
-                    if "error" in result:
-                        print(f"    ✗ API call failed: {result['error']}")
-                        failed += 1
-                    else:
-                        print(f"    ✓ Success: {relative_path}")
-                        successful += 1
-                    
-                    # Add a small delay to avoid rate limiting
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    print(f"    ✗ Failed to process {json_file}: {str(e)}")
-                    failed += 1
+                    self._created_dirs.add(output_dir)
+                
+                # Write the result
+                data = _dumps(result)
+                with open(output_file, 'wb') as f:
+                    f.write(data)
             
-            # Update totals
-            total_successful += successful
-            total_failed += failed
-            total_files += len(json_files)
+            if cached:
+                lines.append(f"    ✓ Cached: {relative_path}")
+                succeeded = True
+            elif "error" in result:
+                lines.append(f"    ✗ API call failed: {result['error']}")
+                succeeded = False
+            else:
+                lines.append(f"    ✓ Success: {relative_path}")
+                succeeded = True
+                if cache_path is not None:
+                    self._write_cache(cache_path, data if data is not None else _dumps(result))
             
-            print(f"\nSubfolder summary: {successful} successful, {failed} failed")
-        
-        print(f"\n{'='*60}")
-        print(f"Overall processing complete:")
-        print(f"  Total files: {total_files}")
-        print(f"  Successful: {total_successful}")
-        print(f"  Failed: {total_failed}")
-        print(f"{'='*60}")
+            return succeeded, lines, record
+            
+        except Exception as e:
+            lines.append(f"    ✗ Failed to process {json_file}: {str(e)}")
+            return False, lines, None
+
+    def _cache_path(self, output_folder: str, relative_path: str, raw_request: bytes, iteration: int,
+                    function_call_mode: str, thinking_budget: int) -> str:
+        """Return the cache file for a request file, keyed by its path, its bytes and every call setting."""
+        settings = (relative_path, self.base_url, function_call_mode, thinking_budget, self.fc2, iteration)
+        key = hashlib.sha256(raw_request + repr(settings).encode('utf-8')).hexdigest()
+        return os.path.join(output_folder, '.cache', key[:2], key)
+
+    @staticmethod
+    def _read_cache(cache_path: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result, or None if there is no usable successful result."""
+        try:
+            with open(cache_path, 'rb') as f:
+                result = _loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(result, dict) or "error" in result:
+            return None
+        return result
+
+    def _write_cache(self, cache_path: str, data: bytes) -> None:
+        """Store a successful result in the cache; the rename keeps readers from seeing a partial file."""
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir not in self._created_dirs:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._created_dirs.add(cache_dir)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
 
 
 def str2bool(v):
@@ -464,6 +694,17 @@ def main():
                         help='Use OpenAI-compatible endpoint (default: False)')
     parser.add_argument('--location', type=str, default='global',
                         help='GCP location/region (default: global)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Number of requests sent in parallel (default: 1)')
+    parser.add_argument('--rpm', type=int, default=60,
+                        help='Maximum requests per minute, 0 disables the limit (default: 60)')
+    parser.add_argument('--gzip', type=str2bool, default=False,
+                        help='Send request bodies gzip-compressed (default: False)')
+    parser.add_argument('--use-cache', type=str2bool, default=False,
+                        help='Skip requests whose successful result is cached in the output folder (default: False)')
+    parser.add_argument('--output-mode', type=str, default="files",
+                        choices=["files", "jsonl"],
+                        help='Write one JSON file per request, or one JSONL file per subfolder (default: files)')
 
     args = parser.parse_args()
     
@@ -480,6 +721,11 @@ def main():
     model_name = args.model_name
     openai_endpoint = args.openai_endpoint
     location = args.location
+    concurrency = args.concurrency
+    rpm = args.rpm
+    gzip_requests = args.gzip
+    use_cache = args.use_cache
+    output_mode = args.output_mode
 
     # Check if input folder exists
     if not os.path.exists(input_folder):
@@ -490,7 +736,8 @@ def main():
     # Create API caller instance with credentials
     caller = GeminiAPICaller(credentials=credentials, fc2=fc2, function_call_mode=function_call_mode,
                             project=project, model_name=model_name, openai_endpoint=openai_endpoint,
-                            location=location)
+                            location=location, rpm=rpm, gzip_requests=gzip_requests,
+                            use_cache=use_cache, output_mode=output_mode)
     
     # Process all files for each iteration
     print(f"Processing files from: {input_folder}")
@@ -503,13 +750,22 @@ def main():
     print(f"Model: {model_name}")
     print(f"Location: {location}")
     print(f"OpenAI endpoint: {openai_endpoint}")
+    print(f"Concurrency: {concurrency}")
+    print(f"Requests per minute: {rpm}")
+    print(f"Gzip requests: {gzip_requests}")
+    print(f"Use cache: {use_cache}")
+    print(f"Output mode: {output_mode}")
     print(f"Base URL: {caller.base_url}")
     
-    for iteration in range(1, iterations + 1):
-        print(f"\n{'='*80}")
-        print(f"STARTING ITERATION {iteration} of {iterations}")
-        print(f"{'='*80}")
-        caller.process_folder(input_folder, output_folder, iteration, function_call_mode, thinking_budget)
+    try:
+        for iteration in range(1, iterations + 1):
+            print(f"\n{'='*80}")
+            print(f"STARTING ITERATION {iteration} of {iterations}")
+            print(f"{'='*80}")
+            caller.process_folder(input_folder, output_folder, iteration, function_call_mode, thinking_budget,
+                                  concurrency)
+    finally:
+        caller.close()
 
 
 if __name__ == "__main__":
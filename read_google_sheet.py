@@ -8,26 +8,41 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
-def read_prompt_column(sheet_url_or_id, worksheet_name=None):
+# Service account key used to authenticate
+PATH_TO_CREDENTIAL = '/Users/wangez/Downloads/GCP_Credentials/agolis-allen-first-13f3be86c3d1.json'
+
+# Authorized client shared by all calls, created on first use by _get_client
+_client = None
+
+
+def _get_client():
+    """Return the shared authorized gspread client, authenticating on first use."""
+    global _client
+    if _client is None:
+        creds = Credentials.from_service_account_file(PATH_TO_CREDENTIAL, scopes=SCOPES)
+        _client = gspread.authorize(creds)
+
+        # import google.auth
+        # credentials, _ = google.auth.default()
+        # _client = gspread.authorize(credentials)
+    return _client
+
+
+def read_prompt_column(sheet_url_or_id, worksheet_name=None, client=None):
     """
     Read the 'prompt' column from a Google Sheet and return as a list.
 
     Args:
         sheet_url_or_id: Google Sheet URL or ID
         worksheet_name: Name of the worksheet (if None, uses first sheet)
+        client: Authorized gspread client (if None, uses the shared client)
 
     Returns:
         List of values from the 'prompt' column
     """
     # Authenticate
-    path_to_credential = '/Users/wangez/Downloads/GCP_Credentials/agolis-allen-first-13f3be86c3d1.json'
-    creds = Credentials.from_service_account_file(path_to_credential, scopes=SCOPES)
-    client = gspread.authorize(creds)
-
-
-    # import google.auth
-    # credentials, _ = google.auth.default()
-    # client = gspread.authorize(credentials)
+    if client is None:
+        client = _get_client()
 
     # Open the spreadsheet
     if sheet_url_or_id.startswith('http'):
@@ -41,16 +56,22 @@ def read_prompt_column(sheet_url_or_id, worksheet_name=None):
     else:
         worksheet = sheet.get_worksheet(0)  # First sheet
 
-    # Get all records as list of dictionaries
-    records = worksheet.get_all_records()
+    # Fetch the values once; the rows after the header are the data rows, as in get_all_records
+    values = worksheet.get_all_values()
+    if not values:
+        return []
+    header_row, rows = values[0], values[1:]
 
-    # Extract the 'prompt' column
-    prompt_list = [record.get('Prompt', '') for record in records]
+    # Extract the 'Prompt' column, keeping one entry per data row
+    if 'Prompt' not in header_row:
+        return [''] * len(rows)
+    prompt_index = header_row.index('Prompt')
+    prompt_list = [row[prompt_index] if prompt_index < len(row) else '' for row in rows]
 
     return prompt_list
 
 
-def add_random_column(sheet_url_or_id, random_numbers, worksheet_name=None, column_name='fc'):
+def add_random_column(sheet_url_or_id, random_numbers, worksheet_name=None, column_name='fc', client=None):
     """
     Add random numbers to a new column in the sheet.
 
@@ -59,11 +80,11 @@ def add_random_column(sheet_url_or_id, random_numbers, worksheet_name=None, colu
         random_numbers: List of random numbers to add
         worksheet_name: Name of the worksheet (if None, uses first sheet)
         column_name: Name of the new column to create (default: 'fc')
+        client: Authorized gspread client (if None, uses the shared client)
     """
     # Authenticate
-    path_to_credential = '/Users/wangez/Downloads/GCP_Credentials/agolis-allen-first-13f3be86c3d1.json'
-    creds = Credentials.from_service_account_file(path_to_credential, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    if client is None:
+        client = _get_client()
 
     # Open the spreadsheet
     if sheet_url_or_id.startswith('http'):
@@ -81,16 +102,20 @@ def add_random_column(sheet_url_or_id, random_numbers, worksheet_name=None, colu
     header_row = worksheet.row_values(1)
     next_col = len(header_row) + 1
 
-    # Add column header
-    worksheet.update_cell(1, next_col, column_name)
-
     # Format random numbers as list of lists for batch update
     random_numbers_formatted = [[num] for num in random_numbers]
 
-    # Update cells starting from row 2 (after header)
+    # Cells starting from row 2 (after header)
     num_rows = len(random_numbers)
+    header_cell = gspread.utils.rowcol_to_a1(1, next_col)
     cell_range = f'{gspread.utils.rowcol_to_a1(2, next_col)}:{gspread.utils.rowcol_to_a1(num_rows + 1, next_col)}'
-    worksheet.update(cell_range, random_numbers_formatted)
+
+    # Write the column header and the numbers in a single request;
+    # RAW stores the values as-is, without the server parsing them as user input
+    worksheet.batch_update([
+        {'range': header_cell, 'values': [[column_name]]},
+        {'range': cell_range, 'values': random_numbers_formatted}
+    ], value_input_option='RAW')
 
     print(f"Added {num_rows} random numbers to column '{column_name}'")
 
@@ -105,12 +130,8 @@ if __name__ == '__main__':
         print(f"Found {len(prompts)} prompts")
 
         print("\nGenerating random numbers for all prompts...")
-        random_numbers = []
-        for i, prompt in enumerate(prompts, 1):
-            # Generate random number for each prompt
-            random_num = random.random()
-            random_numbers.append(random_num)
-            print(f"Processed {i}/{len(prompts)}: Generated {random_num:.6f}")
+        # Generate one random number per prompt
+        random_numbers = [random.random() for _ in range(len(prompts))]
 
         print(f"\nCollected {len(random_numbers)} random numbers")
         print("Updating sheet with all numbers in one batch...")